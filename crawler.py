@@ -2,199 +2,1117 @@
 """
 tor_crawler.py
 
-Simple Tor-backed crawler using Selenium+Firefox (geckodriver).
+Simple Tor-backed crawler using aiohttp (or Selenium+Firefox for JS-heavy pages).
 - Reads a newline-separated file of URLs (can include .onion addresses)
-- Deduplicates and crawls up to max_links_per_site links
-- Searches page source for a keyword
-- Writes simple results.html with matches (link, title, snippet, timestamp)
+- Deduplicates and crawls up to max_links_per_site links, several at a time
+- Searches page source for one or more keywords
+- Writes simple results.html with matches (link, title, snippet, timestamp) as they are found
 
 USAGE (example):
-    python3 tor_crawler.py --input input_links.txt --keyword test --max 20 --headless
+    python3 tor_crawler.py --input input_links.txt --keyword test --max 20 --jobs 8
+    python3 tor_crawler.py --input input_links.txt --keyword test --selenium --headless
 
 LEGAL: Use only for authorized/legitimate research. Do NOT use to access illegal content.
 """
 
 import argparse
+import asyncio
+import atexit
+import bisect
+import hashlib
+import heapq
+import json
+import logging
+import logging.handlers
+import mmap
+import os
+import queue
+import re
+import secrets
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import threading
 import time
-import random
 import sys
+from array import array
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from html import escape, unescape
+from urllib.parse import urlsplit
+import aiohttp
+from aiohttp_socks import ProxyConnector
 from selenium import webdriver
 from selenium.webdriver.firefox.service import Service
 from selenium.webdriver.firefox.options import Options
+from selenium.webdriver.firefox.remote_connection import FirefoxRemoteConnection
+from selenium.webdriver.remote.client_config import ClientConfig
 from selenium.common.exceptions import WebDriverException, TimeoutException
-from bs4 import BeautifulSoup
+try:
+    import ahocorasick  # pyahocorasick, optional: faster multi-keyword search
+except ImportError:
+    ahocorasick = None
+try:
+    import xxhash  # optional: faster 64-bit URL hashing
+except ImportError:
+    xxhash = None
 
 # === Configuration defaults ===
 TOR_SOCKS_HOST = "127.0.0.1"
 TOR_SOCKS_PORT = 9050
 GECKODRIVER_PATH = "/usr/local/bin/geckodriver"  # change if needed
 FIREFOX_BINARY = None  # set to path if nonstandard, else None
+STATE_DIR = os.path.expanduser("~/.credscan")  # everything CredScan keeps between runs
+PROFILE_DIR = os.path.join(STATE_DIR, "ffprofile")  # kept between runs so Firefox reuses its startup cache
+WARM_FILES = ("libxul.so", "omni.ja", "browser/omni.ja")  # big Firefox files read on every start
+DEFAULT_JOBS = 8  # concurrent fetches through Tor
+FETCH_TIMEOUT = 60  # Tor can be slow
+PRECONNECT_TIMEOUT = 10  # cap on a warm-up HEAD; a host slower than this is not worth warming
+USER_AGENT = "Mozilla/5.0 (Research)"
+
+FRONTIER_PATH = os.path.join(STATE_DIR, "frontier.json")  # links left over by --max are saved here for the next run
+STATE_PATH = os.path.join(STATE_DIR, "crawled.sqlite")  # URLs already crawled, skipped on later runs unless --force
+LEDGER_COMMIT_EVERY = 100  # ledger rows per SQLite commit
+MAX_TRIES = 3  # runs a link may time out or get 429/5xx before it is given up
+GAVE_UP = -1  # ledger status of links given up after MAX_TRIES
+POLITENESS_FACTOR = 2.0  # wait this many times a host's typical response time between its requests
+LATENCY_EMA_ALPHA = 0.3  # weight of the newest sample in a host's latency average
+SIEVE_MAX_INMEM = 1_000_000  # URL hashes kept in memory before the sieve merges them to disk
+SNIPPET_RADIUS = 120  # chars of page kept on each side of a keyword hit
+
+# Runs in the browser so only the window around a hit (plus the title) crosses the
+# marionette channel instead of the whole serialized page.
+# Error pages and non-text documents are reported instead of scanned.
+# arguments: lowercased keywords, SNIPPET_RADIUS -> {status, skip: reason} | {status} | {status, window, title}
+SNIPPET_JS = """
+const nav = performance.getEntriesByType("navigation")[0];
+const status = nav ? nav.responseStatus : 0;  // 0/undefined when the browser doesn't expose it
+if (status && (status < 200 || status >= 300)) return {status, skip: "HTTP " + status};
+if (!/^(text\\/|application\\/xhtml\\+xml)/.test(document.contentType)) return {status, skip: "not a text page (" + document.contentType + ")"};
+const html = document.documentElement ? document.documentElement.outerHTML : "";
+const lowered = html.toLowerCase();
+let idx = -1;
+for (const k of arguments[0]) {
+    const i = lowered.indexOf(k);
+    if (i !== -1 && (idx === -1 || i < idx)) idx = i;
+}
+if (idx === -1) return {status};
+// lowercasing can change the length (e.g. "İ"); then slice the text the offset belongs to
+const src = lowered.length === html.length ? html : lowered;
+return {status, window: src.slice(Math.max(0, idx - arguments[1]), idx + arguments[1]), title: document.title};
+"""
+
+TEXT_CONTENT_TYPES = ("text/", "application/xhtml+xml")  # pages worth scanning (incl. plain-text dumps)
+
+log = logging.getLogger("credscan")
+
+_TAG_RE = re.compile(r"<[^>]*>|<[^>]*$")
+_TITLE_RE = re.compile(r"<title[^>]*>(.*?)</title>", re.IGNORECASE | re.DOTALL)
 
 # === Helper functions ===
-def make_firefox_driver(headless=True, tor_host=TOR_SOCKS_HOST, tor_port=TOR_SOCKS_PORT):
-    """Create a Firefox Selenium WebDriver configured to use Tor SOCKS proxy."""
+def warm_firefox_files():
+    """Ask the kernel to start reading Firefox's largest files into the page cache."""
+    if not hasattr(os, "posix_fadvise"):
+        return
+    binary = FIREFOX_BINARY or shutil.which("firefox")
+    if not binary:
+        return
+    # /usr/bin/firefox is usually a symlink into the real install dir
+    install_dir = os.path.dirname(os.path.realpath(binary))
+    for name in WARM_FILES:
+        try:
+            fd = os.open(os.path.join(install_dir, name), os.O_RDONLY)
+        except OSError:
+            continue
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)  # readahead in the background
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+def make_firefox_driver(headless=True, tor_host=TOR_SOCKS_HOST, tor_port=TOR_SOCKS_PORT, command_pool_size=1,
+                        isolation_key=None, profile_dir=None):
+    """Create a Firefox Selenium WebDriver configured to use Tor SOCKS proxy.
+
+    command_pool_size sizes the urllib3 pool behind the driver's command channel;
+    isolation_key, if given, is sent as the SOCKS username so Tor puts this driver
+    on its own circuit. profile_dir, if given, is used (and kept) as the Firefox
+    profile instead of a fresh temporary one; no two running drivers may share it.
+    Stop the driver with quit_firefox_driver so its geckodriver goes away too.
+    """
     options = Options()
     if headless:
         options.add_argument("--headless")
     # If you installed a custom firefox binary:
     if FIREFOX_BINARY:
         options.binary_location = FIREFOX_BINARY
+    # Return from get() at DOMContentLoaded; we only need the page source, not every subresource
+    options.page_load_strategy = "eager"
 
-    # Create a Firefox profile and configure Tor SOCKS proxy
-    profile = webdriver.FirefoxProfile()
-    profile.set_preference("network.proxy.type", 1)
-    profile.set_preference("network.proxy.socks", tor_host)
-    profile.set_preference("network.proxy.socks_port", tor_port)
-    profile.set_preference("network.proxy.socks_remote_dns", True)
-    profile.set_preference("webdriver_assume_untrusted_issuer", False)
-    profile.update_preferences()
+    # A persistent profile keeps Firefox's startup cache warm across runs;
+    # without one geckodriver creates a fresh temporary profile every time
+    if profile_dir:
+        os.makedirs(profile_dir, exist_ok=True)
+        options.add_argument("-profile")
+        options.add_argument(profile_dir)
 
-    # Attach the profile properly for Selenium 4.6+
-    options.profile = profile
+    # Configure Tor SOCKS proxy (geckodriver writes these into the profile's user.js)
+    options.set_preference("network.proxy.type", 1)
+    options.set_preference("network.proxy.socks", tor_host)
+    options.set_preference("network.proxy.socks_port", tor_port)
+    options.set_preference("network.proxy.socks_remote_dns", True)
+    if isolation_key:
+        options.set_preference("network.proxy.socks_username", isolation_key)
+        options.set_preference("network.proxy.socks_password", "x")
+    options.set_preference("webdriver_assume_untrusted_issuer", False)
+    # Don't spend Tor bandwidth on images, CSS, plugins, WebGL or media
+    options.set_preference("permissions.default.image", 2)
+    options.set_preference("permissions.default.stylesheet", 2)
+    options.set_preference("dom.ipc.plugins.enabled", False)
+    options.set_preference("webgl.disabled", True)
+    options.set_preference("media.autoplay.default", 5)
+    # Keep only the startup cache in a persistent profile: no cached pages, history or
+    # cookies that would end up on disk or link sessions across runs and circuits
+    options.set_preference("browser.cache.disk.enable", False)
+    options.set_preference("places.history.enabled", False)
+    options.set_preference("network.cookie.lifetimePolicy", 2)  # session cookies only
+    options.set_preference("browser.sessionstore.resume_from_crash", False)
+    options.set_preference("privacy.sanitize.sanitizeOnShutdown", True)
+    for item in ("cache", "cookies", "history", "sessions", "offlineApps", "formdata"):
+        options.set_preference(f"privacy.clearOnShutdown.{item}", True)
 
-    # Start the Firefox WebDriver
+    # Start geckodriver ourselves and attach a Remote driver to it, which lets us size the
+    # command channel's connection pool (webdriver.Firefox always uses urllib3's maxsize=1).
+    # keep_alive reuses one TCP connection for all commands (needs geckodriver >= 0.21).
     service = Service(GECKODRIVER_PATH)
-    driver = webdriver.Firefox(service=service, options=options)
+    service.start()
+    client_config = ClientConfig(
+        remote_server_addr=service.service_url,
+        keep_alive=True,
+        timeout=120,
+        # Selenium reads the PoolManager kwargs from this nested key
+        init_args_for_pool_manager={"init_args_for_pool_manager": {"maxsize": command_pool_size}},
+    )
+    try:
+        driver = webdriver.Remote(
+            command_executor=FirefoxRemoteConnection(service.service_url, client_config=client_config),
+            options=options,
+        )
+    except Exception:
+        service.stop()
+        raise
+    driver.service = service  # same attribute webdriver.Firefox exposes
 
     driver.set_page_load_timeout(60)  # Tor can be slow
     return driver
 
+def profile_in_use(profile_dir):
+    """True if a running Firefox holds profile_dir (its lock symlink names a live pid)."""
+    try:
+        target = os.readlink(os.path.join(profile_dir, "lock"))  # "<ip>:+<pid>" on Linux
+        pid = int(target.rpartition("+")[2])
+    except (OSError, ValueError):
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False  # stale lock left by a crash; Firefox clears it itself
+    except PermissionError:
+        pass
+    return True
+
+def quit_firefox_driver(driver):
+    """Quit a driver made by make_firefox_driver and stop its geckodriver service."""
+    try:
+        driver.quit()
+    finally:
+        driver.service.stop()
 
-def search_in_html(html, keyword):
-    """Return a short snippet around the first occurrence of keyword in html (case-insensitive) or None."""
-    if not keyword:
+
+class KeywordMatcher:
+    """Case-insensitive search for many keywords in one pass over a page.
+
+    Uses an Aho-Corasick automaton when pyahocorasick is installed, otherwise a
+    single compiled regex alternation. The regex is also used for the rare page
+    whose lowercased form has a different length (e.g. 'İ'), where automaton
+    offsets would not line up with the original text. Build it once per run,
+    not per page.
+    """
+
+    def __init__(self, keywords):
+        self.keywords = list(dict.fromkeys(k for k in keywords if k))
+        self._automaton = None
+        self._pattern = None
+        if not self.keywords:
+            return
+        self._maxlen = max(len(k.lower()) for k in self.keywords)
+        if ahocorasick is not None:
+            self._automaton = ahocorasick.Automaton()
+            for k in self.keywords:
+                self._automaton.add_word(k.lower(), len(k.lower()))
+            self._automaton.make_automaton()
+        # longest first so a keyword that contains another one still wins at the same offset
+        alternation = "|".join(re.escape(k) for k in sorted(self.keywords, key=len, reverse=True))
+        self._pattern = re.compile(alternation, re.IGNORECASE)
+
+    def __bool__(self):
+        return bool(self.keywords)
+
+    def find(self, html):
+        """Return the index of the first keyword hit in html, or -1."""
+        lowered = html.lower() if self._automaton is not None else None
+        if lowered is not None and len(lowered) == len(html):
+            # matches come out in order of where they end, so keep the earliest start
+            # until no later match could begin before it
+            best = -1
+            for end, length in self._automaton.iter(lowered):
+                if best != -1 and end - self._maxlen + 1 >= best:
+                    break
+                start = end - length + 1
+                if best == -1 or start < best:
+                    best = start
+            return best
+        if self._pattern is not None:
+            m = self._pattern.search(html)
+            if m:
+                return m.start()
+        return -1
+
+def search_in_html(html, matcher):
+    """Return a short snippet around the first keyword hit of matcher in html (case-insensitive) or None."""
+    if not matcher:
         return None
-    lowered = html.lower()
-    k = keyword.lower()
-    idx = lowered.find(k)
+    idx = matcher.find(html)
     if idx == -1:
         return None
-    start = max(0, idx - 120)
-    end = min(len(html), idx + 120)
-    snippet = html[start:end]
-    # Clean snippet with BeautifulSoup to remove tags if present
-    try:
-        s = BeautifulSoup(snippet, "lxml").get_text()
-    except Exception:
-        s = snippet
-    return "..." + s.strip().replace("\n", " ") + "..."
-
-def write_result_html(entries, outpath="results.html"):
-    """Write results list to a simple HTML file."""
-    with open(outpath, "w", encoding="utf-8") as f:
-        f.write("<!doctype html>\n<html><head><meta charset='utf-8'><title>Crawl Results</title></head><body>\n")
-        f.write(f"<h1>Crawl Results — {datetime.utcnow().isoformat()} UTC</h1>\n")
-        for e in entries:
-            f.write("<div style='margin-bottom:1.2em;padding:8px;border:1px solid #ddd;'>\n")
-            f.write(f"<a href='{e['url']}' target='_blank'>{e['url']}</a><br/>\n")
-            f.write(f"<strong>Title:</strong> {e.get('title','(no title)')}<br/>\n")
-            f.write(f"<strong>Found:</strong> {e.get('snippet','')}<br/>\n")
-            f.write(f"<strong>When:</strong> {e.get('timestamp')}<br/>\n")
-            f.write("</div>\n")
-        f.write("</body></html>\n")
-
-# === Main crawler ===
-def crawl_file(input_path, keyword, max_links_per_site=50, delay_min=5, delay_max=12, headless=True):
-    # read links
-    with open(input_path, "r", encoding="utf-8") as fh:
-        raw = fh.read().splitlines()
-    links = [ln.strip() for ln in raw if ln.strip()]
-    if not links:
-        print("No links found in the input file.", file=sys.stderr)
-        return
+    start = max(0, idx - SNIPPET_RADIUS)
+    end = min(len(html), idx + SNIPPET_RADIUS)
+    return clean_snippet(html[start:end])
+
+def clean_snippet(snippet):
+    """Turn a raw HTML window around a hit into the one-line text stored in results."""
+    # Strip tags (including ones cut off at the window edge) and decode entities
+    s = unescape(_TAG_RE.sub(" ", snippet))
+    return "..." + " ".join(s.split()) + "..."
+
+def _render_entry(e):
+    """One result block; user-controlled fields are HTML-escaped."""
+    url = escape(e['url'])
+    return ("<div style='margin-bottom:1.2em;padding:8px;border:1px solid #ddd;'>\n"
+            f"<a href='{url}' target='_blank'>{url}</a><br/>\n"
+            f"<strong>Title:</strong> {escape(e.get('title','(no title)'))}<br/>\n"
+            f"<strong>Found:</strong> {escape(e.get('snippet',''))}<br/>\n"
+            f"<strong>When:</strong> {e.get('timestamp')}<br/>\n"
+            "</div>\n")
+
+class ResultsWriter:
+    """Simple HTML results file written as matches arrive.
+
+    The header is written on enter, every add() appends one entry and syncs it to
+    disk, and the footer is written on exit, so a crashed crawl keeps its matches.
+    Safe to share between worker threads.
+    """
+
+    def __init__(self, outpath="results.html"):
+        self.outpath = outpath
+        self.count = 0
+        self._f = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        self._f = open(self.outpath, "w", encoding="utf-8")
+        self._f.write("<!doctype html>\n<html><head><meta charset='utf-8'><title>Crawl Results</title></head><body>\n"
+                      f"<h1>Crawl Results — {datetime.utcnow().isoformat()} UTC</h1>\n")
+        self._f.flush()
+        return self
+
+    def add(self, entry):
+        with self._lock:
+            self._f.write(_render_entry(entry))
+            self._f.flush()
+            os.fsync(self._f.fileno())
+            self.count += 1
+
+    def __exit__(self, *exc):
+        try:
+            self._f.write("</body></html>\n")
+        finally:
+            self._f.close()
+
+def url_hash(url):
+    """Return a 64-bit hash of url (str or UTF-8 bytes)."""
+    if isinstance(url, str):
+        url = url.encode("utf-8")
+    if xxhash is not None:
+        return xxhash.xxh64_intdigest(url)
+    return int.from_bytes(hashlib.blake2b(url, digest_size=8).digest(), "little")
+
+class UrlSieve:
+    """Mercator-style "URL seen?" test that stores 8-byte hashes instead of URL strings.
+
+    New hashes collect in a small in-memory set. Once it holds max_inmem of them it
+    is sorted and merged sequentially with the sorted hash file on disk, which is
+    searched by bisection through mmap, so resident memory stays bounded.
+    """
+
+    def __init__(self, max_inmem=SIEVE_MAX_INMEM):
+        self.max_inmem = max_inmem
+        self._recent = set()
+        self._file = None
+        self._mm = None
+        self._sorted = memoryview(b"").cast("Q")
+
+    def add(self, url):
+        """Record url; return True if it had not been seen before."""
+        h = url_hash(url)
+        if h in self._recent:
+            return False
+        i = bisect.bisect_left(self._sorted, h)
+        if i < len(self._sorted) and self._sorted[i] == h:
+            return False
+        self._recent.add(h)
+        if len(self._recent) >= self.max_inmem:
+            self._flush()
+        return True
+
+    def _flush(self):
+        """Merge the in-memory hashes into a new sorted file that replaces the old one."""
+        merged = tempfile.TemporaryFile()
+        buf = array("Q")
+        for h in heapq.merge(self._sorted, sorted(self._recent)):
+            buf.append(h)
+            if len(buf) >= 65536:
+                buf.tofile(merged)
+                del buf[:]
+        buf.tofile(merged)
+        merged.flush()
+        self._close_disk()
+        self._file = merged
+        self._mm = mmap.mmap(merged.fileno(), 0, access=mmap.ACCESS_READ)
+        self._sorted = memoryview(self._mm).cast("Q")
+        self._recent.clear()
+
+    def _close_disk(self):
+        self._sorted.release()
+        self._sorted = memoryview(b"").cast("Q")
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def close(self):
+        self._close_disk()
+        self._recent.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def iter_lines(input_path):
+    """Yield the stripped, non-empty lines of input_path as bytes, straight from an mmap of the file."""
+    with open(input_path, "rb") as fh:
+        try:
+            mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file: nothing to map
+            return
+        with mm:
+            pos, size = 0, len(mm)
+            while pos < size:
+                nl = mm.find(b"\n", pos)
+                if nl == -1:
+                    nl = size
+                line = mm[pos:nl].strip()
+                if line:
+                    yield line
+                pos = nl + 1
+
+class HostScheduler:
+    """Hands out links one host at a time with an adaptive per-host politeness delay.
+
+    Links are queued per host and each host has at most one request in flight.
+    Between two requests to the same host we wait factor * (moving average of that
+    host's response time), clamped to [min_delay, max_delay]; different hosts
+    never wait on each other. Thread-safe, so async workers and Selenium threads
+    can both use it.
+    """
+
+    def __init__(self, links, min_delay, max_delay, factor=POLITENESS_FACTOR, alpha=LATENCY_EMA_ALPHA):
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.factor = factor
+        self.alpha = alpha
+        self.latencies = {}  # host -> moving average of response time (sec)
+        self.hits = {}  # host -> keyword matches this run
+        self.failures = {}  # host -> moving average of transient failures (0 = none, 1 = every request)
+        self.retry = []  # links to try again next run (see is_transient)
+        self._queues = {}  # host -> deque of (n, link)
+        self._inflight = {}  # host -> link being crawled
+        self._warming = set()  # ready hosts some worker has peek()ed at
+        for n, link in enumerate(links, 1):
+            self._queues.setdefault(host_of(link), deque()).append((n, link))
+        # hosts with queued links and nothing in flight: (next allowed time, seq, host)
+        self._ready = [(0.0, i, host) for i, host in enumerate(self._queues)]
+        self._seq = len(self._ready)
+        self._lock = threading.Lock()
+
+    @property
+    def host_count(self):
+        """Hosts that still have links queued (an upper bound on useful workers)."""
+        return len(self._queues)
+
+    def delay_for(self, host):
+        """Current politeness delay for host."""
+        ema = self.latencies.get(host)
+        delay = self.min_delay if ema is None else self.factor * ema
+        return min(max(delay, self.min_delay), self.max_delay)
+
+    def take(self, prefer=None):
+        """Claim the ready host whose next slot comes first, or `prefer` if it is still ready.
+
+        Returns (wait, host, n, link) -- sleep `wait` seconds, then crawl -- or None
+        when every remaining link belongs to a host another worker is busy with
+        (that worker picks them up after calling done()).
+        """
+        with self._lock:
+            self._warming.discard(prefer)
+            if not self._ready:
+                return None
+            for i, (_, _, host) in enumerate(self._ready):
+                if host == prefer:
+                    return self._pop(i)
+            return self._pop()
+
+    def peek(self):
+        """Return (host, link) that take() would hand out right now, without claiming it.
+
+        None if no host may be hit yet or another worker is already warming the first
+        one, so a host gets at most one warm-up request at a time.
+        """
+        with self._lock:
+            if not self._ready:
+                return None
+            next_ok, _, host = self._ready[0]
+            if next_ok > time.monotonic() or host in self._warming:
+                return None
+            self._warming.add(host)
+            return host, self._queues[host][0][1]
+
+    def unpeek(self, host):
+        """Drop a peek() whose warm-up was abandoned, so another worker may warm host."""
+        with self._lock:
+            self._warming.discard(host)
+
+    def _pop(self, i=0):
+        if i == 0:
+            next_ok, _, host = heapq.heappop(self._ready)
+        else:
+            next_ok, _, host = self._ready[i]
+            self._ready[i] = self._ready[-1]
+            self._ready.pop()
+            heapq.heapify(self._ready)
+        self._warming.discard(host)
+        n, link = self._queues[host].popleft()
+        self._inflight[host] = link
+        return max(0.0, next_ok - time.monotonic()), host, n, link
+
+    def done(self, host, latency, hit=False, retry=False):
+        """Release host after a request that took `latency` seconds and schedule its next link.
+
+        retry=True keeps the link in .retry for the next run.
+        """
+        with self._lock:
+            link = self._inflight.pop(host)
+            if retry:
+                self.retry.append(link)
+            rate = self.failures.get(host)
+            self.failures[host] = float(retry) if rate is None else rate + self.alpha * (retry - rate)
+            if hit:
+                self.hits[host] = self.hits.get(host, 0) + 1
+            ema = self.latencies.get(host)
+            self.latencies[host] = latency if ema is None else ema + self.alpha * (latency - ema)
+            if self._queues[host]:
+                heapq.heappush(self._ready, (time.monotonic() + self.delay_for(host), self._seq, host))
+                self._seq += 1
+            else:
+                del self._queues[host]
+
+def is_transient(status):
+    """True if a fetch that ended with HTTP `status` (None: no response) is worth retrying later.
+
+    Onion services and Tor often answer 429 or 5xx for a while and then recover.
+    """
+    return status is None or status == 429 or status >= 500
+
+def host_of(url):
+    """Politeness key for url: its host (with port), lowercased."""
+    return urlsplit(url).netloc.lower() or url
+
+class CrawlFrontier:
+    """Priority queue of links still to crawl, saved to `path` (JSON) so capped crawls resume.
+
+    Links are popped best-first: .onion hosts, hosts that matched in earlier runs,
+    hosts that answered quickly, then shallow paths; ties keep input order.
+    Hosts not crawled yet count as typical (median) speed, and hosts whose
+    requests kept timing out or failing are pushed down.
+    Which links were already crawled is the CrawlLedger's business, not the frontier's.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.host_hits = {}  # host -> keyword matches seen in earlier runs
+        self.host_latency = {}  # host -> average response time from earlier runs (sec)
+        self.host_failures = {}  # host -> share of recent requests that failed transiently
+        self._neutral_speed = 0.5
+        self.tries = {}  # queued link -> runs in which it already failed transiently
+        self._heap = []  # (-score, seq, link)
+        self._seq = 0
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as fh:
+                state = json.load(fh)
+            self.host_hits = state["host_hits"]
+            self.host_latency = state["host_latency"]
+            self.host_failures = state.get("host_failures", {})
+            self.tries = state.get("tries", {})
+            self._update_neutral_speed()
+            # rescored on load, since the host history may have changed since they were queued
+            for link in state["links"]:
+                self.push(link)
+
+    def __len__(self):
+        return len(self._heap)
 
-    # deduplicate preserving order
-    seen = set()
-    uniq_links = []
-    for l in links:
-        if l not in seen:
-            seen.add(l)
-            uniq_links.append(l)
-
-    print(f"Total unique links to consider: {len(uniq_links)}")
-    # limit total overall? we follow per-site limit only (as in screenshot)
-    entries = []
-    driver = None
+    def score(self, link):
+        parts = urlsplit(link)
+        host = parts.netloc.lower()
+        s = 0.0
+        if (parts.hostname or "").endswith(".onion"):
+            s += 2.0
+        s += min(self.host_hits.get(host, 0), 5)
+        latency = self.host_latency.get(host)
+        s += self._neutral_speed if latency is None else 1.0 / (1.0 + latency)
+        s -= 2.0 * self.host_failures.get(host, 0.0)
+        s -= 0.25 * len([seg for seg in parts.path.split("/") if seg])
+        s -= 10.0 * self.tries.get(link, 0)  # retries rank below every fresh link
+        return s
+
+    def push(self, link):
+        heapq.heappush(self._heap, (-self.score(link), self._seq, link))
+        self._seq += 1
+
+    def extend(self, links, skip=None):
+        """Queue the links (str, or UTF-8 bytes as from iter_lines) that are not queued already.
+
+        links is consumed as a stream; new links for which skip(link) is true are
+        dropped. Returns how many were dropped that way.
+        """
+        skipped = 0
+        with UrlSieve() as seen:
+            for _, _, link in self._heap:
+                seen.add(link)
+            # the sieve hashes raw bytes, so only unique links are ever decoded to str
+            for link in links:
+                if not seen.add(link):
+                    continue
+                if isinstance(link, bytes):
+                    link = link.decode("utf-8", "replace")
+                if skip is not None and skip(link):
+                    skipped += 1
+                else:
+                    self.push(link)
+        return skipped
+
+    def pop_many(self, k):
+        """Remove and return up to k links, best first."""
+        return [heapq.heappop(self._heap)[2] for _ in range(min(k, len(self._heap)))]
+
+    def requeue(self, links):
+        """Put back popped links that failed transiently so a later run retries them.
+
+        Returns the links that have now failed MAX_TRIES times; those are dropped.
+        """
+        gave_up = []
+        for link in links:
+            tries = self.tries.get(link, 0) + 1
+            if tries >= MAX_TRIES:
+                self.tries.pop(link, None)
+                gave_up.append(link)
+            else:
+                self.tries[link] = tries
+                self.push(link)
+        return gave_up
+
+    def learn(self, latencies, hits, failures):
+        """Fold one run's host latencies, match counts and failure rates into the history used for scoring."""
+        self.host_latency.update(latencies)
+        self.host_failures.update(failures)
+        for host, count in hits.items():
+            self.host_hits[host] = self.host_hits.get(host, 0) + count
+        self._update_neutral_speed()
+
+    def _update_neutral_speed(self):
+        """Speed bonus for hosts without history: the median over the hosts we know."""
+        if self.host_latency:
+            self._neutral_speed = statistics.median(1.0 / (1.0 + l) for l in self.host_latency.values())
+
+    def save(self):
+        if not self.path:
+            return
+        links = [link for _, _, link in sorted(self._heap)]
+        state = {
+            "links": links,
+            "tries": {link: self.tries[link] for link in links if link in self.tries},
+            "host_hits": self.host_hits,
+            "host_latency": self.host_latency,
+            "host_failures": self.host_failures,
+        }
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(state, fh)
+        os.replace(tmp, self.path)
+
+class CrawlLedger:
+    """SQLite table of URLs already crawled, so later runs only fetch what is new.
+
+    Rows are keyed by the 64-bit hash of the URL together with the keyword set,
+    so changing --keyword re-checks old pages. With path=None nothing is stored.
+    Safe to share between worker threads.
+    """
+
+    def __init__(self, path, keywords=()):
+        self._salt = "\n" + "\n".join(sorted({k.lower() for k in keywords}))
+        self._db = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS crawled(h INTEGER PRIMARY KEY, ts INTEGER, status INTEGER, hit INTEGER)")
+
+    def _key(self, url):
+        h = url_hash(url + self._salt)
+        return h - (1 << 64) if h >= (1 << 63) else h  # SQLite integers are signed
+
+    def seen(self, url):
+        if self._db is None:
+            return False
+        with self._lock:
+            return self._db.execute("SELECT ts FROM crawled WHERE h=?", (self._key(url),)).fetchone() is not None
+
+    def record(self, url, status, hit):
+        """Remember that url was fetched with HTTP `status` (0 if unknown, GAVE_UP) and whether it matched.
+
+        Transient failures (see is_transient) are not stored, so those URLs are
+        retried on the next run.
+        """
+        if self._db is None or is_transient(status):
+            return
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO crawled VALUES (?, ?, ?, ?)",
+                             (self._key(url), int(time.time()), status, int(hit)))
+            self._pending += 1
+            if self._pending >= LEDGER_COMMIT_EVERY:
+                self._db.commit()
+                self._pending = 0
+
+    def close(self):
+        if self._db is not None:
+            self._db.commit()
+            self._db.close()
+            self._db = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def plan_crawl(input_path, max_links_per_site, frontier_path=FRONTIER_PATH, ledger=None, force=False):
+    """Merge input_path into the saved frontier; return (frontier, links to crawl now) or None.
+
+    Links the ledger has already seen are dropped unless force is set.
+    """
+    frontier = CrawlFrontier(frontier_path)
+    skipped = frontier.extend(iter_lines(input_path), skip=ledger.seen if ledger is not None and not force else None)
+    if skipped:
+        log.info("Skipping %d links crawled in earlier runs (use --force to re-crawl).", skipped)
+    if not frontier:
+        log.warning("No new links to crawl in %s.", input_path)
+        return None
+
+    log.info("Total unique links to consider: %d", len(frontier))
+    batch = frontier.pop_many(max_links_per_site)
+    if frontier:
+        log.info("Reached max_links_per_site limit, %d links left for the next run.", len(frontier))
+    return frontier, batch
+
+def finish_crawl(frontier, scheduler, writer, ledger):
+    """Save what this run learned and the leftover frontier, then report the results file."""
+    gave_up = frontier.requeue(scheduler.retry)
+    for link in gave_up:
+        ledger.record(link, GAVE_UP, False)
+    if gave_up:
+        log.info("Giving up on %d links that failed in %d runs.", len(gave_up), MAX_TRIES)
+    frontier.learn(scheduler.latencies, scheduler.hits, scheduler.failures)
+    frontier.save()
+    log.info("Wrote %d matches to %s", writer.count, writer.outpath)
+
+def make_entry(url, title, snippet):
+    """Build a result entry as consumed by ResultsWriter.add."""
+    return {
+        "url": url,
+        "title": title,
+        "snippet": snippet,
+        "timestamp": datetime.utcnow().isoformat() + "Z"
+    }
+
+def open_results():
+    """Return a ResultsWriter for a new timestamped results file."""
+    return ResultsWriter(f"results_{int(time.time())}.html")
+
+# === Async crawler (default) ===
+def tor_socks_url(isolation_key, tor_host=TOR_SOCKS_HOST, tor_port=TOR_SOCKS_PORT):
+    """SOCKS URL whose username gives its connections their own Tor circuit (IsolateSOCKSAuth)."""
+    return f"socks5://{isolation_key}:x@{tor_host}:{tor_port}"
+
+class BadResponse(Exception):
+    """The response was dropped before its body was read (error status or not a text page)."""
+
+    def __init__(self, reason, status):
+        super().__init__(reason)
+        self.status = status
+
+async def fetch(session, url):
+    """GET url through session and return (status, html); raise BadResponse for pages not worth reading."""
+    async with session.get(url, timeout=aiohttp.ClientTimeout(total=FETCH_TIMEOUT)) as r:
+        if not 200 <= r.status < 300:
+            raise BadResponse(f"HTTP {r.status}", r.status)
+        ctype = r.headers.get("Content-Type", "")
+        if ctype and not ctype.lower().startswith(TEXT_CONTENT_TYPES):
+            raise BadResponse(f"not a text page ({ctype})", r.status)
+        return r.status, await r.text(errors="replace")
+
+async def _crawl_one_async(session, n, link, matcher):
+    """Fetch and scan one link.
+
+    Returns (status, entry): the HTTP status, or None if no response arrived, and
+    a result entry on a keyword match, else None.
+    """
+    log.info("[%d] Crawling: %s", n, link)
     try:
-        driver = make_firefox_driver(headless=headless)
-    except WebDriverException as e:
-        print("Failed to start geckodriver/firefox. Ensure geckodriver path is correct and Firefox is installed.", file=sys.stderr)
-        print(str(e), file=sys.stderr)
-        return
+        status, html = await fetch(session, link)
+    except BadResponse as e:
+        log.info("  -> [%d] Skipped %s: %s", n, link, e)
+        return e.status, None
+    except asyncio.TimeoutError:
+        log.warning("  -> [%d] Timeout loading %s", n, link)
+        return None, None
+    except aiohttp.ClientError as e:
+        log.warning("  -> [%d] HTTP error for %s: %s", n, link, e)
+        return None, None
+    except Exception as e:
+        log.warning("  -> [%d] Error while crawling %s: %s", n, link, e)
+        return None, None
+
+    snippet = search_in_html(html, matcher) if matcher else None
+    if not snippet:
+        log.debug("  -> [%d] no keyword match", n)
+        return status, None
+
+    m = _TITLE_RE.search(html)
+    title = " ".join(unescape(m.group(1)).split()) if m else ""  # _render_entry escapes it again
+    log.info("  -> [%d] MATCH: keyword found, saved result for %s", n, link)
+    return status, make_entry(link, title, snippet)
 
-    count = 0
+async def _preconnect(session, url):
+    """HEAD url's origin so the Tor circuit and a keep-alive connection exist before the real GET.
+
+    Returns True if the host answered at all.
+    """
+    parts = urlsplit(url)
     try:
-        for link in uniq_links:
-            # stop if we reached per-site cap (this mimics screenshot logic where count resets per file)
-            count += 1
-            if count > max_links_per_site:
-                print("Reached max_links_per_site limit, stopping.")
-                break
-
-            print(f"\n[{count}] Crawling: {link}")
+        async with session.head(f"{parts.scheme}://{parts.netloc}/", allow_redirects=False,
+                                timeout=aiohttp.ClientTimeout(total=PRECONNECT_TIMEOUT)):
+            return True
+    except Exception:
+        return False  # best effort: the GET reports any real error
+
+async def _async_worker(scheduler, matcher, writer, ledger):
+    """Crawl links handed out by scheduler over this worker's own session and Tor circuit."""
+    # rdns=True resolves hostnames through Tor (required for .onion, avoids DNS leaks)
+    connector = ProxyConnector.from_url(tor_socks_url(secrets.token_hex(8)), rdns=True)
+    async with aiohttp.ClientSession(connector=connector, headers={"User-Agent": USER_AGENT}) as session:
+        job = scheduler.take()
+        while job is not None:
+            wait, host, n, link = job
+            # build a circuit to the host likely to come next while this request is in flight;
+            # it is not claimed, so an idle worker may still take it first
+            ahead = scheduler.peek()
+            warm = asyncio.create_task(_preconnect(session, ahead[1])) if ahead else None
+            status = entry = None
+            t = time.monotonic()
             try:
-                # Try to navigate. Tor can make sites slow/unreliable, so catch timeouts
-                driver.get(link)
-                time.sleep(1)  # small wait for initial render
+                if wait:
+                    log.debug("  [%d] waiting %.1fs for %s", n, wait, host)
+                    await asyncio.sleep(wait)
+                    t = time.monotonic()
+                status, entry = await _crawl_one_async(session, n, link, matcher)
+                if entry:
+                    await asyncio.to_thread(writer.add, entry)  # fsync off the event loop
+                if not is_transient(status):
+                    await asyncio.to_thread(ledger.record, link, status, entry is not None)
+            except BaseException:
+                if warm:
+                    warm.cancel()
+                raise
+            finally:
+                scheduler.done(host, time.monotonic() - t, hit=entry is not None, retry=is_transient(status))
+            # stick with the warmed host only if it already answered; never wait on its HEAD
+            warmed = False
+            if warm:
+                if warm.done():
+                    warmed = warm.result()
+                else:
+                    warm.cancel()
+                if not warmed:
+                    scheduler.unpeek(ahead[0])
+            job = scheduler.take(prefer=ahead[0] if warmed else None)
 
-                # Get page source
-                html = driver.page_source or ""
-                # try to get title
+async def crawl_file_async(input_path, matcher, max_links_per_site=50, delay_min=1, delay_max=12,
+                           delay_factor=POLITENESS_FACTOR, jobs=DEFAULT_JOBS, frontier_path=FRONTIER_PATH,
+                           state_path=STATE_PATH, force=False):
+    """Crawl the best max_links_per_site links with `jobs` concurrent aiohttp workers through Tor."""
+    with CrawlLedger(state_path, matcher.keywords) as ledger:
+        plan = plan_crawl(input_path, max_links_per_site, frontier_path, ledger, force)
+        if not plan:
+            return
+        frontier, batch = plan
+
+        scheduler = HostScheduler(batch, delay_min, delay_max, factor=delay_factor)
+        workers = min(jobs, scheduler.host_count)
+        with open_results() as writer:
+            await asyncio.gather(*(
+                _async_worker(scheduler, matcher, writer, ledger)
+                for _ in range(workers)
+            ))
+
+        finish_crawl(frontier, scheduler, writer, ledger)
+
+# === Selenium crawler (fallback for JS-heavy pages) ===
+class DriverPool:
+    """A fixed set of Firefox drivers shared by worker threads (check out with get, return with put).
+
+    Every driver gets its own SOCKS username and therefore its own Tor circuit,
+    and, if profile_root is set, its own persistent profile directory under it.
+    """
+
+    def __init__(self, size=0, headless=True, tor_host=TOR_SOCKS_HOST, tor_port=TOR_SOCKS_PORT,
+                 profile_root=PROFILE_DIR):
+        self.headless = headless
+        self.tor_host = tor_host
+        self.tor_port = tor_port
+        self.profile_root = profile_root
+        self.size = 0
+        self._drivers = []
+        self._idle = queue.Queue()
+        self.grow(size)
+
+    def grow(self, size):
+        """Start drivers until the pool holds `size` of them."""
+        while self.size < size:
+            driver = self._start_driver(size)
+            self._drivers.append(driver)
+            self._idle.put(driver)
+            self.size += 1
+
+    def _start_driver(self, size):
+        kwargs = dict(headless=self.headless, tor_host=self.tor_host, tor_port=self.tor_port,
+                      command_pool_size=max(size, 1), isolation_key=secrets.token_hex(8))
+        if self.profile_root:
+            # Firefox locks a profile while running, so every pooled driver needs its own
+            profile_dir = os.path.join(self.profile_root, f"{'headless' if self.headless else 'window'}-{self.size}")
+            if profile_in_use(profile_dir):
+                log.warning("Profile %s is in use by another Firefox; using a temporary one.", profile_dir)
+            else:
                 try:
-                    title = driver.title
-                except Exception:
-                    title = ""
-
-                snippet = search_in_html(html, keyword) if keyword else None
-                if snippet:
-                    entry = {
-                        "url": link,
-                        "title": title,
-                        "snippet": snippet,
-                        "timestamp": datetime.utcnow().isoformat() + "Z"
-                    }
-                    entries.append(entry)
-                    print(f"  -> MATCH: keyword found, saved result for {link}")
-                else:
-                    print("  -> no keyword match")
+                    return make_firefox_driver(profile_dir=profile_dir, **kwargs)
+                except WebDriverException as e:
+                    # if the profile was not the problem, the retry below raises the real error
+                    log.warning("Could not start Firefox with profile %s (%s); retrying with a temporary one.",
+                                profile_dir, e.msg or e)
+        return make_firefox_driver(**kwargs)
 
-            except TimeoutException:
-                print(f"  -> Timeout loading {link}")
-            except WebDriverException as e:
-                print(f"  -> WebDriver error for {link}: {e}")
-            except Exception as e:
-                print(f"  -> Error while crawling {link}: {e}")
+    def get(self):
+        return self._idle.get()
 
-            # polite random delay between requests (important when crawling)
-            delay = random.uniform(delay_min, delay_max)
-            print(f"  sleeping {delay:.1f}s")
-            time.sleep(delay)
+    def put(self, driver):
+        self._idle.put(driver)
 
+    def close_all(self):
+        for driver in self._drivers:
+            try:
+                quit_firefox_driver(driver)
+            except Exception:
+                pass
+        self._drivers = []
+        self._idle = queue.Queue()
+        self.size = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close_all()
+
+# Pools live for the whole process so repeated crawl_file calls skip browser cold-start.
+_DRIVER_POOLS = {}
+
+def get_driver_pool(size, headless=True, profile_root=PROFILE_DIR):
+    """Return the process-wide DriverPool for these settings, started with at least `size` drivers."""
+    key = (headless, TOR_SOCKS_HOST, TOR_SOCKS_PORT, profile_root)
+    pool = _DRIVER_POOLS.get(key)
+    if pool is None:
+        warm_firefox_files()
+        # register before starting drivers so a partial start is still cleaned up
+        pool = _DRIVER_POOLS[key] = DriverPool(headless=headless, profile_root=profile_root)
+        atexit.register(pool.close_all)
+    pool.grow(size)
+    return pool
+
+def _crawl_one(pool, n, link, matcher):
+    """Load and scan one link in a pooled driver.
+
+    Returns (status, entry) like _crawl_one_async; status is 0 when the page loaded
+    but the browser does not expose its HTTP status.
+    """
+    log.info("[%d] Crawling: %s", n, link)
+    status = entry = None
+    driver = pool.get()
+    try:
+        # Try to navigate. Tor can make sites slow/unreliable, so catch timeouts
+        driver.get(link)  # eager: returns once the DOM is parsed
+
+        # Scan in the page; only a hit's window comes back, never the full page source.
+        # Runs even without keywords, since it also reports the HTTP status and content type.
+        page = driver.execute_script(SNIPPET_JS, [k.lower() for k in matcher.keywords], SNIPPET_RADIUS)
+        status = page.get("status") or 0
+        if "skip" in page:
+            log.info("  -> [%d] Skipped %s: %s", n, link, page["skip"])
+        elif "window" in page:
+            entry = make_entry(link, page["title"] or "", clean_snippet(page["window"]))
+            log.info("  -> [%d] MATCH: keyword found, saved result for %s", n, link)
+        else:
+            log.debug("  -> [%d] no keyword match", n)
+
+    except TimeoutException:
+        log.warning("  -> [%d] Timeout loading %s", n, link)
+    except WebDriverException as e:
+        log.warning("  -> [%d] WebDriver error for %s: %s", n, link, e)
+    except Exception as e:
+        log.warning("  -> [%d] Error while crawling %s: %s", n, link, e)
     finally:
-        if driver:
-            driver.quit()
+        pool.put(driver)
+    return status, entry
+
+def _selenium_worker(pool, scheduler, matcher, writer, ledger):
+    """Thread body: crawl links handed out by scheduler until none are left for this worker."""
+    while (job := scheduler.take()) is not None:
+        wait, host, n, link = job
+        if wait:
+            log.debug("  [%d] waiting %.1fs for %s", n, wait, host)
+            time.sleep(wait)
+        t = time.monotonic()
+        status = entry = None
+        try:
+            status, entry = _crawl_one(pool, n, link, matcher)
+            if entry:
+                writer.add(entry)
+            if not is_transient(status):
+                ledger.record(link, status, entry is not None)
+        finally:
+            scheduler.done(host, time.monotonic() - t, hit=entry is not None, retry=is_transient(status))
 
-    # write results
-    timestamped = f"results_{int(time.time())}.html"
-    write_result_html(entries, outpath=timestamped)
-    print(f"\nWrote {len(entries)} matches to {timestamped}")
+def crawl_file(input_path, matcher, max_links_per_site=50, delay_min=1, delay_max=12,
+               delay_factor=POLITENESS_FACTOR, headless=True, jobs=DEFAULT_JOBS, frontier_path=FRONTIER_PATH,
+               state_path=STATE_PATH, force=False, profile_root=PROFILE_DIR):
+    """Crawl the best max_links_per_site links with `jobs` pooled Firefox drivers through Tor."""
+    with CrawlLedger(state_path, matcher.keywords) as ledger:
+        plan = plan_crawl(input_path, max_links_per_site, frontier_path, ledger, force)
+        if not plan:
+            return
+        frontier, batch = plan
+
+        scheduler = HostScheduler(batch, delay_min, delay_max, factor=delay_factor)
+        try:
+            pool = get_driver_pool(min(jobs, scheduler.host_count), headless=headless,
+                                   profile_root=profile_root)
+        except WebDriverException as e:
+            log.error("Failed to start geckodriver/firefox. Ensure geckodriver path is correct and Firefox is installed.")
+            log.error("%s", e)
+            return
+
+        with open_results() as writer, ThreadPoolExecutor(max_workers=pool.size) as ex:
+            workers = [ex.submit(_selenium_worker, pool, scheduler, matcher, writer, ledger) for _ in range(pool.size)]
+            for w in workers:
+                w.result()
+
+        finish_crawl(frontier, scheduler, writer, ledger)
 
 # === CLI ===
+def setup_logging(level=logging.INFO):
+    """Send log records through a queue to a background thread so workers never block on stderr."""
+    q = queue.SimpleQueue()
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    listener = logging.handlers.QueueListener(q, handler)
+    listener.start()
+    atexit.register(listener.stop)  # registered first, so it runs after the driver pools close
+    log.addHandler(logging.handlers.QueueHandler(q))
+    log.setLevel(level)
+    log.propagate = False
+
 def parse_args():
-    p = argparse.ArgumentParser(description="Tor-backed crawler (Selenium + Firefox).")
+    p = argparse.ArgumentParser(description="Tor-backed crawler (aiohttp, or Selenium + Firefox).")
     p.add_argument("--input", "-i", default="input_links.txt", help="Input file with newline-separated URLs")
-    p.add_argument("--keyword", "-k", default="", help="Keyword to search for (case-insensitive)")
-    p.add_argument("--max", "-m", type=int, default=50, help="Max links to crawl (per file)")
-    p.add_argument("--headless", action="store_true", help="Run Firefox headless")
-    p.add_argument("--delay-min", type=float, default=5.0, help="Minimum delay between requests (sec)")
-    p.add_argument("--delay-max", type=float, default=12.0, help="Maximum delay between requests (sec)")
-    return p.parse_args()
+    p.add_argument("--keyword", "-k", action="append", default=[], help="Keyword to search for (case-insensitive); repeat for several")
+    p.add_argument("--max", "-m", type=int, default=50, help="Max links to crawl (per file); the rest are saved for the next run")
+    p.add_argument("--frontier", default=FRONTIER_PATH, help="File keeping uncrawled links and host history between runs ('' to disable)")
+    p.add_argument("--state", default=STATE_PATH, help="SQLite file of already-crawled URLs, which also lets capped crawls resume ('' to disable)")
+    p.add_argument("--force", action="store_true", help="Re-crawl URLs the state file says were already crawled")
+    p.add_argument("--jobs", "-j", type=int, default=DEFAULT_JOBS,
+                   help="Concurrent workers, each with its own Tor circuit (capped at the number of hosts)")
+    p.add_argument("--selenium", action="store_true", help="Load pages in Firefox instead of aiohttp (for JS-heavy .onion pages)")
+    p.add_argument("--headless", action="store_true", help="Run Firefox headless (with --selenium)")
+    p.add_argument("--profile-dir", default=PROFILE_DIR,
+                   help="Where to keep Firefox profiles between runs (with --selenium; '' for throwaway profiles)")
+    p.add_argument("--delay-min", type=float, default=1.0, help="Minimum delay between requests to the same host (sec)")
+    p.add_argument("--delay-max", type=float, default=12.0, help="Maximum delay between requests to the same host (sec)")
+    verbosity = p.add_mutually_exclusive_group()
+    verbosity.add_argument("--quiet", "-q", action="store_true", help="Only log warnings and errors")
+    verbosity.add_argument("--verbose", "-v", action="store_true", help="Also log per-link misses and politeness waits")
+    p.add_argument("--delay-factor", type=float, default=POLITENESS_FACTOR,
+                   help="Wait this many times a host's average response time before hitting it again")
+    args = p.parse_args()
+    if args.jobs < 1:
+        p.error("--jobs must be at least 1")
+    return args
 
 if __name__ == "__main__":
     args = parse_args()
+    setup_logging(logging.WARNING if args.quiet else logging.DEBUG if args.verbose else logging.INFO)
     # Safety check
-    if not args.keyword:
-        print("Warning: no keyword provided — script will crawl but won't record keyword matches.", file=sys.stderr)
-    print(f"Starting crawl (input={args.input}, keyword={args.keyword!r}, max={args.max})")
-    crawl_file(args.input, args.keyword, max_links_per_site=args.max, delay_min=args.delay_min, delay_max=args.delay_max, headless=args.headless)
+    matcher = KeywordMatcher(args.keyword)
+    if not matcher:
+        log.warning("Warning: no keyword provided — script will crawl but won't record keyword matches.")
+    log.info("Starting crawl (input=%s, keywords=%r, max=%d, jobs=%d)", args.input, matcher.keywords, args.max, args.jobs)
+    if args.selenium:
+        crawl_file(args.input, matcher, max_links_per_site=args.max, delay_min=args.delay_min, delay_max=args.delay_max, delay_factor=args.delay_factor, headless=args.headless, jobs=args.jobs, frontier_path=args.frontier, state_path=args.state, force=args.force, profile_root=args.profile_dir)
+    else:
+        asyncio.run(crawl_file_async(args.input, matcher, max_links_per_site=args.max, delay_min=args.delay_min, delay_max=args.delay_max, delay_factor=args.delay_factor, jobs=args.jobs, frontier_path=args.frontier, state_path=args.state, force=args.force))